@@ -12,8 +12,7 @@ print("\n" + "=" * 80)
 print("HTML FILE TEST")
 print("=" * 80)
 
-html_json = converter.convert_to_json(open("multi_table_test.html").read())
-html_data = json.loads(html_json)
+html_data = converter.convert_to_obj(open("multi_table_test.html").read())
 
 print(f"\nTotal tables found in HTML: {len(html_data)}")
 
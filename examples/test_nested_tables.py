@@ -6,7 +6,7 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from html_table_converter import HTMLTableConverter
+from html_table_converter import HTMLTableConverter, PDF_TABLE_SETTINGS
 
 print("=" * 80)
 print("TESTING NESTED TABLES")
@@ -80,8 +80,7 @@ print("\n1. HTML NESTED TABLES")
 print("-" * 80)
 
 try:
-    json_output = converter.convert_to_json(html_with_nested)
-    data = json.loads(json_output)
+    data = converter.convert_to_obj(html_with_nested)
     
     print(f"Tables extracted: {len(data)}")
     
@@ -125,7 +124,7 @@ try:
         print(f"PDF pages: {len(pdf.pages)}")
         
         for page_num, page in enumerate(pdf.pages):
-            tables = page.extract_tables()
+            tables = page.extract_tables(table_settings=PDF_TABLE_SETTINGS)
             print(f"\nPage {page_num + 1}: {len(tables)} tables")
             
             for table_idx, table in enumerate(tables):
@@ -179,8 +178,7 @@ print("\n4. ACTUAL NESTED TABLE STRUCTURE (from HTML)")
 print("-" * 80)
 
 try:
-    json_output = converter.convert_to_json(html_with_nested)
-    data = json.loads(json_output)
+    data = converter.convert_to_obj(html_with_nested)
     
     if len(data) > 0:
         first_table = data[0]
@@ -1,33 +1,495 @@
-from bs4 import BeautifulSoup
+from lxml import etree
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import copy
+import functools
+import hashlib
+import itertools
 import json
+import re
+import sys
+import threading
 import pdfplumber
 from typing import List, Dict, Any, Tuple
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Cheap pre-parse check for documents that cannot contain any table
+_TABLE_TAG = re.compile(r"<table", re.IGNORECASE)
+_TABLE_TAG_BYTES = re.compile(rb"<table", re.IGNORECASE)
+# Charset declarations libxml2 honours on its own, looked for where browsers do
+_CHARSET_DECL = re.compile(rb"<meta[^>]+charset|<\?xml[^>]+encoding", re.IGNORECASE)
+_CHARSET_SCAN_BYTES = 1024
+# lxml refuses str input that opens with an encoding declaration
+_XML_DECL = re.compile(r"\s*<\?xml[^>]*>")
+
+# Precompiled XPath expressions used to walk table structure
+_TOP_LEVEL_TABLES = etree.XPath("//table[not(ancestor::table)]")
+# Tables inside a cell that are not themselves nested in another of its tables
+_TABLE_DEPTH = etree.XPath("count(ancestor::table)")
+_NESTED_TABLES = etree.XPath(".//table[count(ancestor::table) = $depth]")
+_UNCACHEABLE = etree.XPath(".//script|.//form")
+# Cell text outside <script>, <style> and <template>, which get_text() never shows
+_VISIBLE_TEXT = etree.XPath(
+    ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False,
+)
+# Table detection settings for pdfplumber's extract_tables(): ruling lines only,
+# so pages are never put through the slower text-alignment inference
+PDF_TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "snap_tolerance": 3,
+}
+
+# Most pages sent to a PDF worker process in one task
+_PDF_CHUNK_PAGES = 8
+
+# Cell strings shorter than this are interned, since short values repeat heavily
+_INTERN_MAX_LEN = 64
+
+# Distinct header shapes remembered per converter, least recently used evicted first
+_SHAPE_CACHE_SIZE = 256
+
+_HAS_SPANS = etree.XPath(
+    "boolean((./tr|./thead/tr|./tbody/tr|./tfoot/tr)/*[(self::td or self::th) and (@rowspan or @colspan)])"
+)
+
+def _table_rows(table):
+    """
+    Return the <tr> elements of a table in document order, whether they sit
+    directly under it or inside its thead/tbody/tfoot sections.
+    Child iteration with a tag filter runs in lxml's C code without the
+    per-call context setup of an XPath evaluation.
+    """
+    rows = []
+    for child in table.iterchildren('tr', 'thead', 'tbody', 'tfoot'):
+        if child.tag == 'tr':
+            rows.append(child)
+        else:
+            rows.extend(child.iterchildren('tr'))
+    return rows
+
+def _dumps(obj, pretty=False):
+    """
+    Serialize obj to a JSON string, using orjson when it is installed.
+    Output is compact unless pretty is set, which indents by two spaces.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+def _dumps_bytes(obj):
+    """
+    Serialize obj to compact UTF-8 encoded JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+@functools.lru_cache(maxsize=1024)
+def _make_unique(headers):
+    """
+    Suffix repeated headers with _1, _2, ... so every key is distinct.
+    Takes and returns a tuple so results for recurring header rows are cached.
+    """
+    seen = {}
+    new_headers = []
+    for h in headers:
+        # Header keys repeat in every record, so always intern them
+        count = seen.get(h)
+        if count is None:
+            seen[h] = 0
+            new_headers.append(sys.intern(h))
+        else:
+            count += 1
+            seen[h] = count
+            new_headers.append(sys.intern(f"{h}_{count}"))
+    return tuple(new_headers)
+
+def _rows_to_records(headers, rows):
+    """
+    Turn rows into dicts keyed by headers. Short rows start from a copy of an
+    all-None template, and extra trailing cells are dropped by zip.
+    """
+    width = len(headers)
+    template = dict.fromkeys(headers)
+    # Suffixed headers can collide with real ones ("a", "a", "a_1"); the template
+    # then has fewer keys than headers, and short rows are padded instead so the
+    # last value for a repeated key still wins
+    use_template = len(template) == width
+    records = []
+    for row in rows:
+        if len(row) >= width:
+            records.append(dict(zip(headers, row)))
+        elif use_template:
+            record = template.copy()
+            record.update(zip(headers, row))
+            records.append(record)
+        else:
+            records.append(dict(zip(headers, row + [None] * (width - len(row)))))
+    return records
+
+def _sniff_encoding(html_content):
+    """
+    Choose the parser encoding for bytes given without one. Returns None, so
+    libxml2 reads the document's own BOM or <meta charset>, when it has one;
+    otherwise UTF-8 if the bytes decode as UTF-8, and None (libxml2's Latin-1
+    fallback) if they do not.
+    """
+    head = html_content[:_CHARSET_SCAN_BYTES]
+    if head[:2] in (b'\xff\xfe', b'\xfe\xff') or head[:3] == b'\xef\xbb\xbf' or b'\x00' in head[:4]:
+        return None
+    if _CHARSET_DECL.search(head):
+        return None
+    try:
+        html_content.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+@functools.lru_cache(maxsize=32)
+def _scans_as_ascii(encoding):
+    """
+    Return True if encoding writes the <table tag as plain ASCII bytes, so raw
+    input in it can be searched with _TABLE_TAG_BYTES. Encodings Python does
+    not know are never scanned; the parser decides what to do with them.
+    """
+    try:
+        return "<table<TABLE".encode(encoding) == b"<table<TABLE"
+    except (LookupError, UnicodeError):
+        return False
+
+def _clean_pdf_cell(cell) -> str:
+    """
+    Strip a PDF cell to text, mapping None to "" and interning short values.
+    """
+    if cell is None:
+        return ""
+    text = str(cell).strip()
+    return sys.intern(text) if len(text) < _INTERN_MAX_LEN else text
+
+def _run_starts(keys, threshold):
+    """
+    Split a sequence of sorted coordinates into runs and return the index where
+    each run starts. A new run begins at the first key that is more than
+    threshold away from the first key of the current run.
+    """
+    starts = [0]
+    anchor = keys[0]
+    for i in range(1, len(keys)):
+        key = keys[i]
+        # If the key is within threshold of the current run, it stays in the run
+        if abs(key - anchor) > threshold:
+            starts.append(i)
+            anchor = key
+    return starts
+
+def _gap_starts(lefts, rights, min_gap):
+    """
+    Split chars sorted by left edge at every blank stretch wider than min_gap
+    and return the index where each run starts. The gap is measured from the
+    rightmost edge seen so far in the run to the next char's left edge, so
+    wide glyphs never count as whitespace.
+    """
+    starts = [0]
+    right = rights[0]
+    for i in range(1, len(lefts)):
+        if lefts[i] - right > min_gap:
+            starts.append(i)
+            right = rights[i]
+        elif rights[i] > right:
+            right = rights[i]
+    return starts
+
+def _take_pending(pending, col):
+    """
+    Pop one row off the rowspan carried in column col and return its value.
+    Once it runs out, an older rowspan it was covering takes the column back.
+    """
+    remaining, value, resume = pending[col]
+    if remaining > 1:
+        pending[col] = (remaining - 1, value, resume)
+    elif resume is not None:
+        pending[col] = resume
+    else:
+        del pending[col]
+    return value
+
+def _skip_pending(entry, rows):
+    """
+    Return what is left of a carried rowspan entry after another rowspan hides
+    it for the given number of rows, or None if nothing outlasts them.
+    """
+    while entry is not None and entry[0] <= rows:
+        rows -= entry[0]
+        entry = entry[2]
+    if entry is None:
+        return None
+    return (entry[0] - rows, entry[1], entry[2])
+
+def _drain_pending(row, pending, start_col):
+    """
+    Append the rowspans still carried into columns at or after start_col,
+    padding any gaps before them with empty strings.
+    """
+    for c in sorted(col for col in pending if col >= start_col):
+        row.extend([""] * (c - len(row)))
+        row.append(_take_pending(pending, c))
+
+def _fill_grid(rowspans, colspans, values, cells_per_row):
+    """
+    Lay out cells on a dense grid, resolving rowspan and colspan.
+
+    The three flat lists hold one entry per cell in document order and
+    cells_per_row says how many of them belong to each <tr>. Rows are built
+    left to right, and rowspans still to be filled are carried per column in
+    a dict until they run out. Values are placed as-is, so a cell may hold
+    text or nested table data.
+    Returns a (max_row + 1) x (max_col + 1) list of lists.
+    """
+    rows_out = []
+    pending = {}  # col -> (remaining_rows, value, resume entry or None)
+    max_row = 0
+    max_col = 0
+    first_cell_idx = 0
+    
+    for current_row_idx, row_cell_count in enumerate(cells_per_row):
+        row = []
+        current_col_idx = 0
+        placed_width = 0  # one past the last column holding a real value
+        
+        for cell_idx in range(first_cell_idx, first_cell_idx + row_cell_count):
+            # Skip columns that are already occupied by a rowspan from above
+            while current_col_idx in pending:
+                row.append(_take_pending(pending, current_col_idx))
+                current_col_idx += 1
+                placed_width = current_col_idx
+            
+            rowspan = rowspans[cell_idx]
+            colspan = colspans[cell_idx]
+            end_col_idx = current_col_idx + colspan
+            
+            if rowspan < 1:
+                # Zero rowspan places nothing, but still consumes its columns
+                for c in range(current_col_idx, end_col_idx):
+                    if c in pending:
+                        row.append(_take_pending(pending, c))
+                        placed_width = c + 1
+                    else:
+                        row.append("")
+                current_col_idx = end_col_idx
+                continue
+            
+            if not colspan:
+                continue
+            
+            # Place the cell over any rowspan carried into its columns. Those
+            # rowspans resume below it if they reach further down.
+            cell_value = values[cell_idx]
+            covered = None
+            if pending:
+                for c in range(current_col_idx, end_col_idx):
+                    if c in pending:
+                        _take_pending(pending, c)
+                        if rowspan > 1 and c in pending:
+                            if covered is None:
+                                covered = {}
+                            covered[c] = pending[c]
+            if rowspan > 1:
+                pending.update(dict.fromkeys(range(current_col_idx, end_col_idx), (rowspan - 1, cell_value, None)))
+                if covered:
+                    for c, entry in covered.items():
+                        pending[c] = (rowspan - 1, cell_value, _skip_pending(entry, rowspan - 1))
+            row.extend([cell_value] * colspan)
+            current_col_idx = placed_width = end_col_idx
+        
+        first_cell_idx += row_cell_count
+        _drain_pending(row, pending, current_col_idx)
+        if len(row) > current_col_idx:
+            placed_width = len(row)
+        if placed_width:
+            max_row = current_row_idx
+            max_col = max(max_col, placed_width - 1)
+        rows_out.append(row)
+
+    # Rowspans reaching past the last <tr> still produce rows
+    current_row_idx = len(rows_out)
+    while pending:
+        row = []
+        _drain_pending(row, pending, 0)
+        max_row = current_row_idx
+        max_col = max(max_col, len(row) - 1)
+        rows_out.append(row)
+        current_row_idx += 1
+
+    # Square off the rows in place into a (max_row + 1) x (max_col + 1) matrix,
+    # touching only the rows that are not already the right width
+    width = max_col + 1
+    del rows_out[max_row + 1:]
+    for row in rows_out:
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+        elif len(row) > width:
+            del row[width:]
+    return rows_out
+
+def _iter_page_chars(pdf):
+    """
+    Yield each page's chars, reduced to the fields the grouping reads, and
+    release the page's parsed layout as soon as they are copied out.
+    """
+    for page in pdf.pages:
+        yield [
+            {'top': c.get('top', 0), 'x0': c.get('x0', 0),
+             'x1': c.get('x1', c.get('x0', 0)), 'text': c['text']}
+            for c in page.chars
+        ]
+        page.flush_cache()
+
+def _extract_chunk_tables(chunk):
+    """
+    Process-pool entry point: extract the tables from a run of pages' chars,
+    returning one list of tables per page.
+    """
+    converter = HTMLTableConverter(cache_size=0)
+    return [converter._extract_tables_by_character_grid(chars) for chars in chunk]
+
 class HTMLTableConverter:
-    def __init__(self):
-        pass
+    def __init__(self, cache_size=128, max_workers=None, parser=None):
+        """
+        Args:
+            cache_size: Number of processed top-level tables to memoize, keyed by
+                        a hash of their HTML. 0 disables the cache.
+            max_workers: If greater than 1, top-level HTML tables are processed on a
+                         thread pool, and PDF pages read through pdfplumber's chars
+                         on a process pool, of up to this many workers
+            parser: Optional lxml etree.HTMLParser to use for all input instead
+                    of the built-in one, e.g. to tune recovery of malformed HTML
+        """
+        self.cache_size = cache_size
+        self.max_workers = max_workers
+        self.parser = parser
+        self._str_parser = etree.HTMLParser(remove_blank_text=True)
+        self._table_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._shape_cache = OrderedDict()  # header rows -> unique header tuple
 
-    def convert_to_json(self, html_content):
+    def convert_to_obj(self, html_content, encoding=None):
         """
-        Parses HTML content, finds tables, and converts them to a JSON structure.
+        Parses HTML content, finds tables, and converts them to Python objects.
         Returns a list of tables, where each table is represented as a list of dictionaries (if headers exist)
         or a list of lists.
+
+        html_content may be a str or raw bytes; bytes are handed to the parser as-is
+        and decoded natively using `encoding` if given. Otherwise the document's
+        own BOM or <meta charset> is used, falling back to UTF-8.
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        tables = soup.find_all('table')
-        results = []
+        return list(self._iter_tables(html_content, encoding))
 
-        for table in tables:
-            # Skip nested tables (they are processed within their parent table)
-            if table.find_parent('table'):
-                continue
+    def convert_to_json(self, html_content, encoding=None, pretty=False):
+        """
+        Same as convert_to_obj, but returns the tables as a JSON string.
+        The JSON is compact unless pretty is set.
+        """
+        return _dumps(self.convert_to_obj(html_content, encoding), pretty)
 
-            table_data = self._process_table(table)
-            results.append(table_data)
-        
-        return json.dumps(results, indent=4)
+    def convert_to_json_stream(self, html_content, fp, encoding=None):
+        """
+        Like convert_to_json, but writes compact UTF-8 JSON to the binary
+        file-like object fp one table at a time instead of building the
+        full result list and its JSON string in memory.
+        """
+        fp.write(b"[")
+        for i, table_data in enumerate(self._iter_tables(html_content, encoding)):
+            if i:
+                fp.write(b",")
+            fp.write(_dumps_bytes(table_data))
+        fp.write(b"]")
+
+    def _iter_tables(self, html_content, encoding):
+        """
+        Parse html_content and yield the processed data of each top-level table in document order.
+        """
+        # Skip building a tree at all when there is no <table> tag to find
+        if not self._may_contain_table(html_content, encoding):
+            return
+
+        if isinstance(html_content, str):
+            # A str is already decoded, so its XML prolog carries no information
+            decl = _XML_DECL.match(html_content)
+            if decl:
+                html_content = html_content[decl.end():]
+
+        if self.parser is not None:
+            parser = self.parser
+        elif isinstance(html_content, bytes):
+            if encoding is None:
+                encoding = _sniff_encoding(html_content)
+            parser = etree.HTMLParser(remove_blank_text=True, encoding=encoding)
+        else:
+            parser = self._str_parser
+        root = etree.HTML(html_content, parser)
+
+        if root is None:
+            return
+
+        # Nested tables are processed within their parent table
+        tables = _TOP_LEVEL_TABLES(root)
+        if self.max_workers and self.max_workers > 1 and len(tables) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tables))) as executor:
+                yield from executor.map(self._process_table_cached, tables)
+        else:
+            for table in tables:
+                yield self._process_table_cached(table)
+
+    def _may_contain_table(self, html_content, encoding):
+        """
+        Return False only if html_content certainly has no <table> tag.
+        Bytes are scanned only when they use an ASCII-compatible encoding.
+        """
+        if not isinstance(html_content, bytes):
+            return _TABLE_TAG.search(html_content) is not None
+        if self.parser is not None:
+            return True
+        if encoding is None:
+            # Left to the parser to detect; UTF-16/32 input shows a BOM or NUL bytes
+            if html_content[:2] in (b'\xff\xfe', b'\xfe\xff') or b'\x00' in html_content[:4]:
+                return True
+        elif not _scans_as_ascii(encoding):
+            return True
+        return _TABLE_TAG_BYTES.search(html_content) is not None
+
+    def _process_table_cached(self, table):
+        """
+        Process a top-level table, reusing the result of an identical table seen before.
+        Tables containing scripts or forms are always processed afresh.
+        """
+        if not self.cache_size or _UNCACHEABLE(table):
+            return self._process_table(table)
+
+        key = hashlib.blake2b(etree.tostring(table, with_tail=False), digest_size=16).digest()
+        with self._cache_lock:
+            cached = self._table_cache.get(key)
+            if cached is not None:
+                self._table_cache.move_to_end(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
 
-    def convert_pdf_to_json(self, pdf_path, use_native_json=True):
+        table_data = self._process_table(table)
+        entry = copy.deepcopy(table_data)
+        with self._cache_lock:
+            self._table_cache[key] = entry
+            if len(self._table_cache) > self.cache_size:
+                self._table_cache.popitem(last=False)
+        return table_data
+
+    def convert_pdf_to_json(self, pdf_path, use_native_json=True, pages=None, pretty=False):
         """
         Extracts tables from a PDF file and converts them to JSON.
         
@@ -35,6 +497,9 @@ class HTMLTableConverter:
             pdf_path: Path to the PDF file
             use_native_json: If True, uses pdfplumber's native JSON extraction
                            If False, uses extract_tables() method
+            pages: Optional list of 1-based page numbers to read; other pages
+                   are never parsed
+            pretty: If True, indent the JSON by two spaces instead of emitting it compact
         
         Returns:
             A JSON string representing a list of tables
@@ -42,21 +507,43 @@ class HTMLTableConverter:
         results = []
         
         if use_native_json:
-            # Use pdfplumber's native JSON extraction
-            with pdfplumber.open(pdf_path) as pdf:
-                # Extract raw PDF JSON
-                pdf_json_str = pdf.to_json()
-                pdf_data = json.loads(pdf_json_str)
-                
-                # Process each page
-                for page_data in pdf_data.get('pages', []):
-                    page_tables = self._extract_tables_from_pdf_json(page_data)
-                    results.extend(page_tables)
+            # Use pdfplumber's native char objects, one page at a time, rather than
+            # serializing the whole document with to_json() and parsing it back
+            with pdfplumber.open(pdf_path, pages=pages) as pdf:
+                if self.max_workers and self.max_workers > 1 and len(pdf.pages) > 1:
+                    # Pages are independent, so group them on worker processes. A few
+                    # small chunks per worker keep every worker busy, and pages are
+                    # read only as chunks are handed out, so at most a bounded
+                    # number of them wait in memory at once.
+                    workers = min(self.max_workers, len(pdf.pages))
+                    chunksize = max(1, min(_PDF_CHUNK_PAGES, len(pdf.pages) // (workers * 4)))
+                    page_chars = _iter_page_chars(pdf)
+                    in_flight = deque()
+                    
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        while True:
+                            chunk = list(itertools.islice(page_chars, chunksize))
+                            if chunk:
+                                in_flight.append(executor.submit(_extract_chunk_tables, chunk))
+                            # Collect results in page order once the pool is saturated
+                            while in_flight and (not chunk or len(in_flight) >= 2 * workers):
+                                for page_tables in in_flight.popleft().result():
+                                    results.extend(page_tables)
+                            if not chunk:
+                                break
+                else:
+                    for page in pdf.pages:
+                        page_data = {'chars': page.chars}
+                        page_tables = self._extract_tables_from_pdf_json(page_data)
+                        results.extend(page_tables)
+                        
+                        # Release the page's parsed layout before moving on
+                        page.flush_cache()
         else:
             # Use pdfplumber's extract_tables() method (original approach)
-            with pdfplumber.open(pdf_path) as pdf:
+            with pdfplumber.open(pdf_path, pages=pages) as pdf:
                 for page in pdf.pages:
-                    tables = page.extract_tables()
+                    tables = page.extract_tables(table_settings=PDF_TABLE_SETTINGS)
                     
                     if not tables:
                         continue
@@ -68,7 +555,7 @@ class HTMLTableConverter:
                         processed_table = self._process_pdf_table(table)
                         results.append(processed_table)
         
-        return json.dumps(results, indent=4)
+        return _dumps(results, pretty)
 
     def _process_pdf_table(self, table):
         """
@@ -79,51 +566,40 @@ class HTMLTableConverter:
         if not table or len(table) == 0:
             return []
         
-        # Clean up None values and whitespace
-        cleaned_table = []
-        for row in table:
-            cleaned_row = [str(cell).strip() if cell is not None else "" for cell in row]
-            cleaned_table.append(cleaned_row)
+        # Clean up None values and whitespace in a single pass
+        cleaned_table = [[_clean_pdf_cell(cell) for cell in row] for row in table]
         
         # Assume first row is header, check if it's a multi-row header
         if len(cleaned_table) > 1:
             # Detect if we have a multi-row header by checking if second row looks like sub-headers
             header_row_count = 1
             
-            # Check if first row contains mostly empty or merged-cell remnants
-            first_row_empty_count = sum(1 for cell in cleaned_table[0] if not cell or cell == "")
-            second_row_empty_count = sum(1 for cell in cleaned_table[1] if not cell or cell == "")
-            
             # Simple heuristic: if second row has more non-empty values and none are repeating
-            # category names, it's likely a sub-header row (like years)
-            if (len(cleaned_table) > 2 and 
-                second_row_empty_count < first_row_empty_count and
-                second_row_empty_count < len(cleaned_table[1]) * 0.5):
-                header_row_count = 2
+            # category names, it's likely a sub-header row (like years). The first row
+            # counts empty or merged-cell remnants; counting is skipped for 2-row tables.
+            if len(cleaned_table) > 2:
+                first_row_empty_count = cleaned_table[0].count("")
+                second_row_empty_count = cleaned_table[1].count("")
+                if (second_row_empty_count < first_row_empty_count and
+                    2 * second_row_empty_count < len(cleaned_table[1])):
+                    header_row_count = 2
             
             header_rows = cleaned_table[:header_row_count]
             data_rows = cleaned_table[header_row_count:]
             
-            # Merge multi-row headers
-            headers = self._merge_header_rows(header_rows)
-            unique_headers = self._make_unique(headers)
+            # Character-grid rows can be wider than the header; give the extra
+            # columns empty header names so their cells are kept
+            width = max(map(len, data_rows), default=0)
+            if width > max(map(len, header_rows)):
+                header_rows = [row + [""] * (width - len(row)) for row in header_rows]
             
-            json_data = []
-            for row in data_rows:
-                record = {}
-                for h_idx, h in enumerate(unique_headers):
-                    if h_idx < len(row):
-                        record[h] = row[h_idx]
-                    else:
-                        record[h] = None
-                json_data.append(record)
-            return json_data
+            # Merge multi-row headers
+            unique_headers = self._resolve_headers(header_rows)
+            return _rows_to_records(unique_headers, data_rows)
         else:
             # Return as list of lists if only one row
             return cleaned_table
 
-        return json.dumps(results, indent=4)
-
     def _extract_tables_from_pdf_json(self, page_data: Dict[str, Any]) -> List[List[Dict]]:
         """
         Extract table structures from pdfplumber's native JSON output.
@@ -182,21 +658,22 @@ class HTMLTableConverter:
         # Group overlapping/nearby boundaries to find tables
         tables = []
         if boundaries:
-            # Simple approach: find bounding box of all boundaries (indicates table region)
-            all_x0 = [b['x0'] for b in boundaries]
-            all_y0 = [b['y0'] for b in boundaries]
-            all_x1 = [b['x1'] for b in boundaries]
-            all_y1 = [b['y1'] for b in boundaries]
+            # Simple approach: find bounding box of all boundaries (indicates table region),
+            # tracking the four extremes in one pass instead of building a list per edge
+            x0 = y0 = float('inf')
+            x1 = y1 = float('-inf')
+            for b in boundaries:
+                if b['x0'] < x0:
+                    x0 = b['x0']
+                if b['y0'] < y0:
+                    y0 = b['y0']
+                if b['x1'] > x1:
+                    x1 = b['x1']
+                if b['y1'] > y1:
+                    y1 = b['y1']
             
-            if all_x0 and all_y0:
-                # Create one large table region
-                table_region = {
-                    'x0': min(all_x0),
-                    'y0': min(all_y0),
-                    'x1': max(all_x1),
-                    'y1': max(all_y1)
-                }
-                tables.append(table_region)
+            # Create one large table region
+            tables.append({'x0': x0, 'y0': y0, 'x1': x1, 'y1': y1})
         
         return tables
 
@@ -204,26 +681,19 @@ class HTMLTableConverter:
         """
         Extract characters within a table region and organize them into a grid.
         """
+        soa = self._chars_to_soa(chars)
+        tops = soa['top']
+        x0s = soa['x0']
+        
         # Filter characters within region
-        region_chars = [c for c in chars 
-                       if region['x0'] <= c.get('x0', 0) <= region['x1'] and
-                          region['y0'] <= c.get('top', 0) <= region['y1']]
+        region_indices = [i for i in range(len(chars))
+                          if region['x0'] <= x0s[i] <= region['x1'] and
+                             region['y0'] <= tops[i] <= region['y1']]
         
-        if not region_chars:
+        if not region_indices:
             return []
         
-        # Sort characters by position (top-left to bottom-right)
-        sorted_chars = sorted(region_chars, key=lambda c: (c.get('top', 0), c.get('x0', 0)))
-        
-        # Group characters into rows (based on y-coordinate)
-        rows = self._group_characters_into_rows(sorted_chars)
-        
-        # Group row characters into cells (based on x-coordinate)
-        table = []
-        for row_chars in rows:
-            cells = self._group_characters_into_cells(row_chars)
-            row_data = [''.join(c['text'] for c in cell).strip() for cell in cells]
-            table.append(row_data)
+        table = self._build_text_grid(soa, region_indices)
         
         # Process into structured format with headers
         if table:
@@ -239,18 +709,15 @@ class HTMLTableConverter:
         if not chars:
             return []
         
-        # Sort by position
-        sorted_chars = sorted(chars, key=lambda c: (c.get('top', 0), c.get('x0', 0)))
+        soa = self._chars_to_soa(chars)
+        table = self._build_text_grid(soa, range(len(chars)))
         
-        # Group into rows
-        rows = self._group_characters_into_rows(sorted_chars)
-        
-        # Group into cells and reconstruct table
-        table = []
-        for row_chars in rows:
-            cells = self._group_characters_into_cells(row_chars)
-            row_data = [''.join(c['text'] for c in cell).strip() for cell in cells]
-            table.append(row_data)
+        # Leading rows narrower than the row after them are titles or captions,
+        # not the header
+        start = 0
+        while start + 1 < len(table) and len(table[start]) < len(table[start + 1]):
+            start += 1
+        table = table[start:]
         
         # Filter out likely non-table content (single-column or very short)
         if len(table) > 2:
@@ -259,60 +726,66 @@ class HTMLTableConverter:
         
         return []
 
-    def _group_characters_into_rows(self, chars: List[Dict], row_threshold: float = 5) -> List[List[Dict]]:
+    def _chars_to_soa(self, chars: List[Dict]) -> Dict[str, List]:
+        """
+        Split pdfplumber char dicts into parallel 'top', 'x0', 'x1' and 'text'
+        lists, so the grouping passes index plain lists instead of looking up
+        dict keys. A char without 'x1' is treated as zero-width.
+        """
+        return {
+            'top': [c.get('top', 0) for c in chars],
+            'x0': [c.get('x0', 0) for c in chars],
+            'x1': [c.get('x1', c.get('x0', 0)) for c in chars],
+            'text': [c['text'] for c in chars],
+        }
+
+    def _build_text_grid(self, soa: Dict[str, List], indices) -> List[List[str]]:
+        """
+        Sort the chars at the given indices top-left to bottom-right, group them
+        into rows and cells, and join each cell's text.
+        """
+        positions = list(zip(soa['top'], soa['x0']))
+        order = sorted(indices, key=positions.__getitem__)
+        texts = soa['text']
+        
+        table = []
+        for row_indices in self._group_characters_into_rows(soa, order):
+            cells = self._group_characters_into_cells(soa, row_indices)
+            table.append([''.join([texts[i] for i in cell]).strip() for cell in cells])
+        return table
+
+    def _group_characters_into_rows(self, soa: Dict[str, List], indices: List[int], row_threshold: float = 5) -> List[List[int]]:
         """
         Group characters into rows based on their vertical position (top coordinate).
+        Takes char indices sorted by position and returns one index list per row.
         """
-        if not chars:
+        if not indices:
             return []
         
-        rows = []
-        current_row = [chars[0]]
-        current_top = chars[0].get('top', 0)
-        
-        for char in chars[1:]:
-            char_top = char.get('top', 0)
-            # If character is within threshold of current row, add to row
-            if abs(char_top - current_top) <= row_threshold:
-                current_row.append(char)
-            else:
-                rows.append(current_row)
-                current_row = [char]
-                current_top = char_top
-        
-        if current_row:
-            rows.append(current_row)
-        
-        return rows
+        tops = soa['top']
+        starts = _run_starts([tops[i] for i in indices], row_threshold)
+        ends = starts[1:] + [len(indices)]
+        return [indices[start:end] for start, end in zip(starts, ends)]
 
-    def _group_characters_into_cells(self, chars: List[Dict], cell_threshold: float = 10) -> List[List[Dict]]:
+    def _group_characters_into_cells(self, soa: Dict[str, List], indices: List[int], cell_threshold: float = 10) -> List[List[int]]:
         """
-        Group characters into cells based on their horizontal position (x0 coordinate).
+        Group characters into cells based on their horizontal extent (x0 to x1).
+        Takes the char indices of one row and returns one index list per cell.
         """
-        if not chars:
+        if not indices:
             return []
         
-        # Sort by x position
-        sorted_chars = sorted(chars, key=lambda c: c.get('x0', 0))
-        
-        cells = []
-        current_cell = [sorted_chars[0]]
-        current_x = sorted_chars[0].get('x0', 0)
-        
-        for char in sorted_chars[1:]:
-            char_x = char.get('x0', 0)
-            # If character is close to current cell, add to cell
-            if abs(char_x - current_x) <= cell_threshold:
-                current_cell.append(char)
-            else:
-                cells.append(current_cell)
-                current_cell = [char]
-                current_x = char_x
+        x0s = soa['x0']
+        x1s = soa['x1']
         
-        if current_cell:
-            cells.append(current_cell)
+        # Sort by x position
+        sorted_indices = sorted(indices, key=x0s.__getitem__)
         
-        return cells
+        # Cells end where the blank space between glyphs exceeds cell_threshold
+        starts = _gap_starts([x0s[i] for i in sorted_indices],
+                             [x1s[i] for i in sorted_indices], cell_threshold)
+        ends = starts[1:] + [len(sorted_indices)]
+        return [sorted_indices[start:end] for start, end in zip(starts, ends)]
 
     def _process_table(self, table):
         """
@@ -320,125 +793,138 @@ class HTMLTableConverter:
         Intelligently merges multi-row headers into composite column names.
         """
         # Collect rows only from the immediate table (exclude nested tables' rows)
-        rows = []
-        # Direct tr children
-        rows.extend(table.find_all('tr', recursive=False))
-        # tr children inside thead, tbody, tfoot
-        for section in table.find_all(['thead', 'tbody', 'tfoot'], recursive=False):
-            rows.extend(section.find_all('tr', recursive=False))
+        rows = _table_rows(table)
             
         if not rows:
             return []
 
-        # 1. Determine grid dimensions and pre-fill
-        grid = {}
-        max_row = 0
-        max_col = 0
-        occupied_cells = set()
-        current_row_idx = 0
-        
-        for tr in rows:
-            current_col_idx = 0
-            cells = tr.find_all(['td', 'th'], recursive=False)
+        # Cells of each row, collected once and shared with header detection below
+        row_cells = [list(tr.iterchildren('td', 'th')) for tr in rows]
+
+        # Bound methods hoisted out of the per-cell loops below. A single probe
+        # for any table below this one lets cells skip the nested-table check.
+        if next(table.iterdescendants('table'), None) is None:
+            cell_value = self._cell_text
+        else:
+            cell_value = self._cell_value
+
+        if not _HAS_SPANS(table):
+            # Fast path: without spans every cell maps straight onto its own column
+            table_matrix = [[cell_value(cell) for cell in cells] for cells in row_cells]
+            # Trailing rows with no cells are dropped, as in _fill_grid
+            while len(table_matrix) > 1 and not table_matrix[-1]:
+                table_matrix.pop()
+            width = max(len(row) for row in table_matrix) or 1
+            for row in table_matrix:
+                row.extend([""] * (width - len(row)))
+        else:
+            # 1. Gather each cell's spans and value, then lay them out on the grid
+            rowspans = []
+            colspans = []
+            values = []
+            cells_per_row = [len(cells) for cells in row_cells]
+            add_rowspan = rowspans.append
+            add_colspan = colspans.append
+            add_value = values.append
             
-            for cell in cells:
-                # Skip columns that are already occupied by a rowspan from above
-                while (current_row_idx, current_col_idx) in occupied_cells:
-                    current_col_idx += 1
-                
-                # Get span attributes
-                rowspan = int(cell.get('rowspan', 1))
-                colspan = int(cell.get('colspan', 1))
-                
-                # Handle nested tables or just text
-                nested_tables = cell.find_all('table')
-                if nested_tables:
-                    cell_data = []
-                    for nt in nested_tables:
-                        cell_data.append(self._process_table(nt))
+            for cells in row_cells:
+                for cell in cells:
+                    # Get span attributes, skipping int() in the common unspanned case.
+                    # cell.get avoids allocating the attrib proxy for every cell.
+                    rs = cell.get('rowspan')
+                    rowspan = 1 if rs is None or rs == '1' else int(rs)
+                    cs = cell.get('colspan')
+                    colspan = 1 if cs is None or cs == '1' else max(int(cs), 0)
+                    add_rowspan(rowspan)
+                    add_colspan(colspan)
                     
-                    if len(cell_data) == 1:
-                        cell_value = cell_data[0]
-                    else:
-                        cell_value = cell_data
-                else:
-                    cell_value = cell.get_text(strip=True)
-                
-                # Fill the grid
-                for r in range(rowspan):
-                    for c in range(colspan):
-                        r_idx = current_row_idx + r
-                        c_idx = current_col_idx + c
-                        grid[(r_idx, c_idx)] = cell_value
-                        occupied_cells.add((r_idx, c_idx))
-                        
-                        max_row = max(max_row, r_idx)
-                        max_col = max(max_col, c_idx)
-                
-                current_col_idx += colspan
-            
-            current_row_idx += 1
+                    # Zero rowspan places nothing, so its content is never read
+                    add_value(cell_value(cell) if rowspan > 0 else None)
 
-        # Convert grid to list of lists
-        table_matrix = []
-        for r in range(max_row + 1):
-            row_data = []
-            for c in range(max_col + 1):
-                row_data.append(grid.get((r, c), ""))
-            table_matrix.append(row_data)
+            table_matrix = _fill_grid(rowspans, colspans, values, cells_per_row)
 
         # Detect header rows and data start
-        headers = []
         data_start_index = 0
         
-        thead = table.find('thead', recursive=False)
-        if thead:
-            thead_rows = thead.find_all('tr', recursive=False)
-            if thead_rows:
-                # Extract header rows from matrix
-                header_row_count = len(thead_rows)
-                header_rows = table_matrix[:header_row_count]
-                data_start_index = header_row_count
-                
-                # Merge multi-row headers
-                headers = self._merge_header_rows(header_rows)
-        else:
-            # No explicit thead. Check if first row is all <th>
-            if rows:
-                first_tr = rows[0]
-                if all(c.name == 'th' for c in first_tr.find_all(['td', 'th'], recursive=False)):
-                    # Single row header
-                    headers = table_matrix[0]
-                    data_start_index = 1
-                    
-                    # Check if second row is also all <th> (multi-row header)
-                    if len(rows) > 1:
-                        second_tr = rows[1]
-                        if all(c.name == 'th' for c in second_tr.find_all(['td', 'th'], recursive=False)):
-                            # Multi-row header detected
-                            header_rows = table_matrix[:2]
-                            headers = self._merge_header_rows(header_rows)
-                            data_start_index = 2
-
-        if headers:
+        thead = table.find('thead')
+        if thead is not None:
+            # Every row inside thead is a header row
+            data_start_index = len(thead.findall('tr'))
+        elif all(c.tag == 'th' for c in row_cells[0]):
+            # No explicit thead, but the first row is all <th>. Check if
+            # second row is also all <th> (multi-row header)
+            if len(row_cells) > 1 and all(c.tag == 'th' for c in row_cells[1]):
+                data_start_index = 2
+            else:
+                data_start_index = 1
+
+        if data_start_index:
             # Create list of dicts
-            json_data = []
-            unique_headers = self._make_unique(headers)
-            
-            for i in range(data_start_index, len(table_matrix)):
-                row = table_matrix[i]
-                record = {}
-                for h_idx, h in enumerate(unique_headers):
-                    if h_idx < len(row):
-                        record[h] = row[h_idx]
-                    else:
-                        record[h] = None
-                json_data.append(record)
-            return json_data
+            unique_headers = self._resolve_headers(table_matrix[:data_start_index])
+            return _rows_to_records(unique_headers, table_matrix[data_start_index:])
         else:
             # Return list of lists if no headers detected
             return table_matrix
 
+    def _cell_value(self, cell):
+        """
+        Return a cell's nested table(s) if it has any, otherwise its text.
+        """
+        # Cheap probe first: most cells hold no table at all, and this skips
+        # both XPath evaluations below for them
+        if next(cell.iterdescendants('table'), None) is None:
+            return self._cell_text(cell)
+
+        cell_data = []
+        for nt in _NESTED_TABLES(cell, depth=_TABLE_DEPTH(cell)):
+            cell_data.append(self._process_table(nt))
+        
+        if len(cell_data) == 1:
+            return cell_data[0]
+        return cell_data
+
+    def _cell_text(self, cell):
+        """
+        Concatenate the stripped text fragments of a cell, skipping comments
+        and the contents of <script>, <style> and <template> elements.
+        Short values are interned so repeated strings share one object.
+        """
+        # Only cells with child elements can hold a script, so plain-text cells
+        # skip the probe
+        if len(cell) and next(cell.iter('script', 'style', 'template'), None) is not None:
+            fragments = _VISIBLE_TEXT(cell)
+        else:
+            fragments = cell.itertext()
+        text = "".join(s.strip() for s in fragments)
+        return sys.intern(text) if len(text) < _INTERN_MAX_LEN else text
+
+    def _resolve_headers(self, header_rows):
+        """
+        Merge header rows into a tuple of unique column names. Tables sharing
+        the same header shape reuse the first result from the shape cache,
+        which keeps the _SHAPE_CACHE_SIZE most recently used shapes.
+        """
+        key = tuple(map(tuple, header_rows))
+        try:
+            hash(key)
+        except TypeError:
+            # Header cells holding nested tables are unhashable; name their columns
+            # by the cell's str(), as _merge_header_rows does for multi-row headers
+            key = tuple(tuple(h if isinstance(h, str) else str(h) for h in row) for row in key)
+
+        with self._cache_lock:
+            unique_headers = self._shape_cache.get(key)
+            if unique_headers is not None:
+                self._shape_cache.move_to_end(key)
+
+        if unique_headers is None:
+            unique_headers = _make_unique(tuple(self._merge_header_rows(key)))
+            with self._cache_lock:
+                self._shape_cache[key] = unique_headers
+                if len(self._shape_cache) > _SHAPE_CACHE_SIZE:
+                    self._shape_cache.popitem(last=False)
+        return unique_headers
+
     def _merge_header_rows(self, header_rows):
         """
         Merge multiple header rows into composite column names.
@@ -468,18 +954,6 @@ class HTMLTableConverter:
         
         return merged_headers
 
-    def _make_unique(self, headers):
-        seen = {}
-        new_headers = []
-        for h in headers:
-            if h in seen:
-                seen[h] += 1
-                new_headers.append(f"{h}_{seen[h]}")
-            else:
-                seen[h] = 0
-                new_headers.append(h)
-        return new_headers
-
 if __name__ == "__main__":
     import sys
     import os
@@ -501,11 +975,11 @@ if __name__ == "__main__":
     ext = ext.lower()
     
     if ext == '.pdf':
-        json_output = converter.convert_pdf_to_json(file_path)
+        json_output = converter.convert_pdf_to_json(file_path, pretty=True)
     elif ext in ['.html', '.htm']:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with open(file_path, 'rb') as f:
             html_content = f.read()
-        json_output = converter.convert_to_json(html_content)
+        json_output = converter.convert_to_json(html_content, pretty=True)
     else:
         print(f"Error: Unsupported file format '{ext}'. Supported: .html, .pdf")
         sys.exit(1)